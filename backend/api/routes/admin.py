@@ -0,0 +1,93 @@
+"""Admin API routes"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse
+from typing import Optional
+from pydantic import BaseModel
+from utils.config import settings
+from utils.security import is_valid_admin_token
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured admin token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not is_valid_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+class ActivateRequest(BaseModel):
+    """Request body for activating a model version"""
+    version: str
+
+
+@router.get("/models")
+async def list_models(request: Request):
+    """Active, previous and available versions of every model"""
+    registry = request.app.state.model_registry
+    return [registry.status(name) for name in registry.model_names]
+
+
+@router.post("/models/{name}/activate")
+async def activate_model(request: Request, name: str, body: ActivateRequest):
+    """Load a stored version in the background, warm it up and swap it in"""
+    try:
+        return await request.app.state.model_registry.activate(name, body.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/models/{name}/rollback")
+async def rollback_model(request: Request, name: str):
+    """Swap the previously active version back in"""
+    try:
+        return await request.app.state.model_registry.rollback(name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+class ProfilingRequest(BaseModel):
+    """Request body for arming the request profiler"""
+    requests: int
+
+
+@router.get("/profiling")
+async def profiling_status(request: Request):
+    """How many upcoming requests will be profiled"""
+    return request.app.state.profiler.status()
+
+
+@router.post("/profiling")
+async def arm_profiling(request: Request, body: ProfilingRequest):
+    """Profile the next N requests under PROFILE_PATH_PREFIXES (0 disarms)"""
+    profiler = request.app.state.profiler
+    profiler.arm(body.requests)
+    return profiler.status()
+
+
+@router.get("/profiles")
+async def list_profiles(request: Request):
+    """Stored request profiles, newest first"""
+    return request.app.state.profiler.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """Summary of a profile, including the top functions by self time"""
+    summary = request.app.state.profiler.get(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+
+@router.get("/profiles/{profile_id}/download")
+async def download_profile(request: Request, profile_id: str):
+    """Zip of the collapsed stacks, summary and TensorFlow trace"""
+    archive = request.app.state.profiler.archive(profile_id)
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(archive, media_type="application/zip", filename=f"profile-{profile_id}.zip")
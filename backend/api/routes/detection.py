@@ -2,13 +2,12 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Request
 from fastapi.responses import JSONResponse
 from typing import Optional
-import numpy as np
-from PIL import Image
-import io
 
 from utils.image_processor import process_image
-from schemas.detection_models import DetectionResponse, CropDetectionResponse
+from utils.upload import decoding_upload, open_upload_image
+from schemas.detection_models import DetectionResponse, CropDetectionResponse, TiledDetectionResponse
 from services.recommendation_service import RecommendationService
+from services.tiled_analysis_service import TiledAnalysisService
 
 router = APIRouter()
 
@@ -20,20 +19,25 @@ async def detect_crop_type(
 ):
     """Detect crop type from image"""
     try:
-        # Read and process image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        processed_image = process_image(image, target_size=(224, 224))
+        # Validate the upload before waiting for an inference slot
+        image = open_upload_image(file, draft_size=(224, 224))
         
-        # Detect crop type
-        crop_detector = request.app.state.crop_detector
-        crop_prediction = await crop_detector.predict(processed_image)
+        async with request.app.state.admission.slot(request):
+            with decoding_upload():
+                processed_image = process_image(image, target_size=(224, 224))
+            
+            # Detect crop type
+            crop_detector = request.app.state.crop_detector
+            crop_prediction = await crop_detector.predict(processed_image)
         
         return CropDetectionResponse(
             crop_type=crop_prediction["class"],
             confidence=crop_prediction["confidence"],
-            crops=crop_prediction["all_classes"]
+            crops=crop_prediction["all_classes"],
+            model_versions={"crop_detector": crop_detector.version}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,21 +51,26 @@ async def detect_disease(
 ):
     """Detect disease in crop image"""
     try:
-        # Read and process image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        processed_image = process_image(image, target_size=(224, 224))
-        
-        # Detect crop type if not provided
-        crop_detector = request.app.state.crop_detector
-        if not crop_type:
-            crop_prediction = await crop_detector.predict(processed_image)
-            crop_type = crop_prediction["class"]
+        # Validate the upload before waiting for an inference slot
+        image = open_upload_image(file, draft_size=(224, 224))
         
-        # Detect disease
-        disease_classifiers = request.app.state.disease_classifiers
-        disease_classifier = disease_classifiers.get_classifier(crop_type)
-        disease_prediction = await disease_classifier.predict(processed_image)
+        async with request.app.state.admission.slot(request):
+            with decoding_upload():
+                processed_image = process_image(image, target_size=(224, 224))
+            
+            # Detect crop type if not provided
+            model_versions = {}
+            crop_detector = request.app.state.crop_detector
+            if not crop_type:
+                crop_prediction = await crop_detector.predict(processed_image)
+                crop_type = crop_prediction["class"]
+                model_versions["crop_detector"] = crop_detector.version
+            
+            # Detect disease
+            disease_classifiers = request.app.state.disease_classifiers
+            disease_classifier = disease_classifiers.get_classifier(crop_type)
+            disease_prediction = await disease_classifier.predict(processed_image)
+            model_versions[crop_type] = disease_classifier.version
         
         # Get recommendations
         recommendation_service = RecommendationService()
@@ -74,8 +83,11 @@ async def detect_disease(
             disease=disease_prediction["class"],
             confidence=disease_prediction["confidence"],
             severity=disease_prediction["severity"],
-            recommendations=recommendations
+            recommendations=recommendations,
+            model_versions=model_versions
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -88,20 +100,23 @@ async def full_detection(
 ):
     """Complete detection pipeline: crop + disease + recommendations"""
     try:
-        # Read and process image
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        processed_image = process_image(image, target_size=(224, 224))
+        # Validate the upload before waiting for an inference slot
+        image = open_upload_image(file, draft_size=(224, 224))
         
-        # Detect crop type
-        crop_detector = request.app.state.crop_detector
-        crop_prediction = await crop_detector.predict(processed_image)
-        crop_type = crop_prediction["class"]
-        
-        # Detect disease
-        disease_classifiers = request.app.state.disease_classifiers
-        disease_classifier = disease_classifiers.get_classifier(crop_type)
-        disease_prediction = await disease_classifier.predict(processed_image)
+        async with request.app.state.admission.slot(request):
+            with decoding_upload():
+                processed_image = process_image(image, target_size=(224, 224))
+            
+            # Detect crop type
+            crop_detector = request.app.state.crop_detector
+            crop_prediction = await crop_detector.predict(processed_image)
+            crop_type = crop_prediction["class"]
+            
+            # Detect disease
+            disease_classifiers = request.app.state.disease_classifiers
+            disease_classifier = disease_classifiers.get_classifier(crop_type)
+            disease_prediction = await disease_classifier.predict(processed_image)
+            model_versions = {"crop_detector": crop_detector.version, crop_type: disease_classifier.version}
         
         # Get recommendations
         recommendation_service = RecommendationService()
@@ -114,8 +129,45 @@ async def full_detection(
             disease=disease_prediction["class"],
             confidence=disease_prediction["confidence"],
             severity=disease_prediction["severity"],
-            recommendations=recommendations
+            recommendations=recommendations,
+            model_versions=model_versions
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/tiled", response_model=TiledDetectionResponse)
+async def tiled_detection(
+    request: Request,
+    file: UploadFile = File(...),
+    crop_type: Optional[str] = None
+):
+    """Tiled analysis of a high-resolution field image: per-tile disease grid + aggregated severity"""
+    try:
+        image = open_upload_image(file)
+        tiled_service = TiledAnalysisService()
+        
+        async with request.app.state.admission.slot(request):
+            with decoding_upload():
+                image = tiled_service.prepare(image)
+            
+            # Detect crop type from the whole image if not provided
+            model_versions = {}
+            if not crop_type:
+                crop_detector = request.app.state.crop_detector
+                crop_prediction = await crop_detector.predict(process_image(image, target_size=(224, 224)))
+                crop_type = crop_prediction["class"]
+                model_versions["crop_detector"] = crop_detector.version
+            
+            disease_classifiers = request.app.state.disease_classifiers
+            disease_classifier = disease_classifiers.get_classifier(crop_type)
+            analysis = await tiled_service.analyze(image, disease_classifier)
+            model_versions[crop_type] = disease_classifier.version
+        
+        return TiledDetectionResponse(crop_type=crop_type, model_versions=model_versions, **analysis)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
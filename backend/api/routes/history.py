@@ -1,8 +1,12 @@
 """History API routes"""
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from utils.config import settings
 from utils.database import get_db
+from utils.image_processor import process_image
+from utils.upload import decoding_upload, open_upload_image
 from models.database_models import DetectionHistory
 from schemas.detection_models import DetectionResponse
 
@@ -39,8 +43,92 @@ async def get_detection(detection_id: int):
         db.close()
 
 
+def _similar_cases(db: Session, matches) -> List[dict]:
+    """Load matched detections (without image data), keeping similarity order"""
+    scores = dict(matches)
+    detections = db.query(DetectionHistory).filter(DetectionHistory.id.in_(list(scores))).all()
+    results = [
+        {
+            "id": d.id,
+            "crop_type": d.crop_type,
+            "disease": d.disease,
+            "confidence": d.confidence,
+            "severity": d.severity,
+            "created_at": d.created_at,
+            "similarity": scores[d.id]
+        }
+        for d in detections
+    ]
+    return sorted(results, key=lambda r: r["similarity"], reverse=True)
+
+
+@router.post("/similar")
+async def find_similar_cases(
+    request: Request,
+    file: UploadFile = File(...),
+    crop_type: Optional[str] = None,
+    k: int = Query(5, ge=1, le=settings.SIMILARITY_MAX_K)
+):
+    """Find previous detections that look like an uploaded image"""
+    db = next(get_db())
+    try:
+        # Validate the upload before waiting for an inference slot
+        image = open_upload_image(file, draft_size=(224, 224))
+        
+        async with request.app.state.admission.slot(request):
+            with decoding_upload():
+                processed_image = process_image(image, target_size=(224, 224))
+            
+            if not crop_type:
+                crop_prediction = await request.app.state.crop_detector.predict(processed_image)
+                crop_type = crop_prediction["class"]
+            
+            classifier = request.app.state.disease_classifiers.get_classifier(crop_type)
+            _, features = await classifier.predict_with_features(processed_image)
+        
+        # Searches run in a thread: building the ANN index on first use takes seconds
+        matches = await asyncio.to_thread(request.app.state.similarity_index.search, crop_type, features, k)
+        return {"crop_type": crop_type, "similar": _similar_cases(db, matches)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
+
+
+@router.get("/{detection_id}/similar")
+async def get_similar_detections(
+    request: Request,
+    detection_id: int,
+    k: int = Query(5, ge=1, le=settings.SIMILARITY_MAX_K)
+):
+    """Find previous detections that look like a stored one"""
+    db = next(get_db())
+    try:
+        detection = db.query(DetectionHistory).filter(DetectionHistory.id == detection_id).first()
+        if not detection:
+            raise HTTPException(status_code=404, detail="Detection not found")
+        
+        similarity_index = request.app.state.similarity_index
+        vector = await asyncio.to_thread(similarity_index.get(detection.crop_type).vector_for, detection_id)
+        if vector is None:
+            raise HTTPException(status_code=404, detail="Detection is not indexed")
+        
+        matches = await asyncio.to_thread(
+            similarity_index.search, detection.crop_type, vector, k, exclude_id=detection_id
+        )
+        return {"crop_type": detection.crop_type, "similar": _similar_cases(db, matches)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        db.close()
+
+
 @router.post("/")
-async def save_detection(detection: dict):
+async def save_detection(request: Request, detection: dict):
     """Save detection to history"""
     db = next(get_db())
     try:
@@ -55,6 +143,18 @@ async def save_detection(detection: dict):
         db.add(db_detection)
         db.commit()
         db.refresh(db_detection)
+        
+        # Index the image for similar-case search; the save itself must not fail on this
+        # (a skipped detection is picked up by the next rebuild-index)
+        try:
+            if db_detection.image_data:
+                async with request.app.state.admission.slot(request):
+                    await request.app.state.similarity_index.index_detection(
+                        request.app.state.disease_classifiers, db_detection
+                    )
+        except Exception as e:
+            print(f"⚠️ Could not index detection {db_detection.id}: {e}")
+        
         return db_detection
     except Exception as e:
         db.rollback()
@@ -64,15 +164,19 @@ async def save_detection(detection: dict):
 
 
 @router.delete("/{detection_id}")
-async def delete_detection(detection_id: int):
+async def delete_detection(request: Request, detection_id: int):
     """Delete detection from history"""
     db = next(get_db())
     try:
         detection = db.query(DetectionHistory).filter(DetectionHistory.id == detection_id).first()
         if not detection:
             raise HTTPException(status_code=404, detail="Detection not found")
+        crop_type = detection.crop_type
         db.delete(detection)
         db.commit()
+        
+        if crop_type:
+            request.app.state.similarity_index.remove(crop_type, detection_id)
         return {"message": "Detection deleted successfully"}
     except HTTPException:
         raise
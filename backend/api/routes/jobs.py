@@ -0,0 +1,100 @@
+"""Asynchronous detection job API routes"""
+import asyncio
+import json
+import time
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
+
+from services.job_queue import JOB_KINDS, TERMINAL_STATUSES, job_to_dict
+from utils.config import settings
+from utils.upload import open_upload_image
+
+router = APIRouter()
+
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+@router.post("/", status_code=202)
+async def submit_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    kind: str = "full",
+    crop_type: Optional[str] = None,
+    language: str = "en"
+):
+    """Queue images for background detection; returns a job id to poll or subscribe to"""
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}. Supported: {JOB_KINDS}")
+    if len(files) > settings.JOB_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.JOB_MAX_IMAGES} images per job")
+    if crop_type:
+        try:
+            request.app.state.disease_classifiers.get_classifier(crop_type)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Reject bad uploads now rather than failing inside the job
+        for file in files:
+            open_upload_image(file)
+
+        job = await request.app.state.job_queue.submit(files, kind, crop_type, language)
+        return JSONResponse(
+            jsonable_encoder(job_to_dict(job, include_results=False)),
+            status_code=202,
+            headers={"Location": f"/api/jobs/{job.id}"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """Job status and progress, with results once finished"""
+    job = request.app.state.job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+@router.get("/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-Sent Events stream of job progress, ending when the job finishes"""
+    job_queue = request.app.state.job_queue
+    if not job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        last_state = None
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            if job is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+
+            state = (job.status, job.completed)
+            if state != last_state:
+                last_state = state
+                event = "done" if job.status in TERMINAL_STATUSES else "progress"
+                data = json.dumps(job_to_dict(job, include_results=event == "done"), default=str)
+                yield f"event: {event}\ndata: {data}\n\n"
+                last_sent = time.monotonic()
+                if event == "done":
+                    return
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                # Keeps mobile proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+            await job_queue.wait_for_update(job_id, timeout=settings.JOB_POLL_SECONDS)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
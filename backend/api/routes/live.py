@@ -0,0 +1,197 @@
+"""Live camera detection over WebSocket"""
+import asyncio
+import io
+import json
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from PIL import Image
+
+from utils.config import settings
+from utils.image_processor import process_image, frame_fingerprint, fingerprint_distance
+from utils.upload import check_image_pixels
+
+router = APIRouter()
+
+
+class LatestFrame:
+    """Single-slot mailbox: a new frame replaces any frame not yet processed"""
+
+    def __init__(self):
+        self.frame: Optional[bytes] = None
+        self.sequence = 0
+        self.dropped = 0
+        self.event = asyncio.Event()
+        self.closed = False
+
+    def put(self, frame: bytes):
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self.sequence += 1
+        self.event.set()
+
+    def skip(self) -> int:
+        """Count a frame that was refused on arrival; returns its sequence number"""
+        self.sequence += 1
+        return self.sequence
+
+    async def take(self):
+        """Wait for the newest frame; returns (None, seq) once closed"""
+        while self.frame is None:
+            if self.closed:
+                return None, self.sequence
+            self.event.clear()
+            await self.event.wait()
+        frame, self.frame = self.frame, None
+        return frame, self.sequence
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+
+def _apply_control(text: str, options: dict, supported_crops):
+    """
+    Apply a control message such as {"crop_type": "maize"}; {"crop_type": null}
+    returns to automatic crop detection. Anything else is ignored.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(message, dict) or "crop_type" not in message:
+        return
+
+    crop_type = message["crop_type"]
+    if crop_type is None:
+        options.pop("crop_type", None)
+    elif isinstance(crop_type, str) and crop_type.lower() in supported_crops:
+        options["crop_type"] = crop_type.lower()
+
+
+async def _receive_frames(websocket: WebSocket, mailbox: LatestFrame, options: dict):
+    """Read frames as fast as the client sends them, keeping only the latest"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                frame = message["bytes"]
+                if len(frame) <= settings.LIVE_FRAME_MAX_BYTES:
+                    mailbox.put(frame)
+                else:
+                    await websocket.send_json({
+                        "type": "error",
+                        "frame": mailbox.skip(),
+                        "detail": f"Frame exceeds {settings.LIVE_FRAME_MAX_BYTES} bytes"
+                    })
+            elif message.get("text"):
+                _apply_control(message["text"], options, websocket.app.state.disease_classifiers.classifiers)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        mailbox.close()
+
+
+@router.websocket("/ws")
+async def live_detection(websocket: WebSocket):
+    """
+    Stream downscaled camera frames as binary messages and receive results.
+    Near-duplicate frames are skipped and stale frames are never queued.
+    """
+    await websocket.accept()
+
+    admission = websocket.app.state.admission
+
+    mailbox = LatestFrame()
+    options = {}
+    receiver = asyncio.create_task(_receive_frames(websocket, mailbox, options))
+
+    last_fingerprint: Optional[int] = None
+    last_crop_type: Optional[str] = None
+    last_processed_at = 0.0
+
+    try:
+        while True:
+            frame, sequence = await mailbox.take()
+            if frame is None:
+                break
+
+            # Cap the frame rate, more tightly while the inference queue is busy
+            fps = settings.LIVE_LOADED_FPS if admission.waiting > 0 else settings.LIVE_MAX_FPS
+            wait = last_processed_at + 1.0 / fps - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                # A newer frame may have arrived while we were waiting
+                if mailbox.frame is not None:
+                    frame, sequence = await mailbox.take()
+
+            try:
+                image = Image.open(io.BytesIO(frame))
+                # Small frames can still declare huge dimensions; check before decoding
+                check_image_pixels(image)
+                image.draft("RGB", (224, 224))
+                fingerprint = frame_fingerprint(image)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "frame": sequence, "detail": e.detail})
+                continue
+            except Exception:
+                await websocket.send_json({"type": "error", "frame": sequence, "detail": "Invalid frame"})
+                continue
+
+            # A frame only counts as a duplicate if it would be scored for the same crop
+            if last_fingerprint is not None and options.get("crop_type") == last_crop_type and \
+                    fingerprint_distance(fingerprint, last_fingerprint) <= settings.LIVE_DEDUP_THRESHOLD:
+                continue
+
+            last_processed_at = time.monotonic()
+            try:
+                async with admission.acquire(deadline=last_processed_at + settings.LIVE_FRAME_DEADLINE_SECONDS):
+                    # Looked up per frame so hot-swapped models are picked up mid-stream
+                    crop_detector = websocket.app.state.crop_detector
+                    disease_classifiers = websocket.app.state.disease_classifiers
+                    processed_image = process_image(image, target_size=(224, 224))
+
+                    requested_crop_type = crop_type = options.get("crop_type")
+                    if not crop_type:
+                        crop_prediction = await crop_detector.predict(processed_image)
+                        crop_type = crop_prediction["class"]
+                        await websocket.send_json({
+                            "type": "crop",
+                            "frame": sequence,
+                            "crop_type": crop_type,
+                            "confidence": crop_prediction["confidence"],
+                            "model_version": crop_detector.version
+                        })
+
+                    disease_classifier = disease_classifiers.get_classifier(crop_type)
+                    disease_prediction = await disease_classifier.predict(processed_image)
+            except HTTPException:
+                # Busy: drop this frame, the next one will be fresher anyway
+                await websocket.send_json({"type": "busy", "frame": sequence})
+                continue
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # One bad frame must not end the stream
+                await websocket.send_json({"type": "error", "frame": sequence, "detail": str(e)})
+                continue
+
+            last_fingerprint, last_crop_type = fingerprint, requested_crop_type
+            await websocket.send_json({
+                "type": "disease",
+                "frame": sequence,
+                "crop_type": crop_type,
+                "disease": disease_prediction["class"],
+                "confidence": disease_prediction["confidence"],
+                "severity": disease_prediction["severity"],
+                "model_version": disease_classifier.version,
+                "dropped_frames": mailbox.dropped
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,152 @@
+"""Command-line tools for the backend
+
+Usage:
+    python cli.py rebuild-index
+    python cli.py score <image_dir> --output results.jsonl
+    python cli.py train <crop|maize|cassava|tomato> <labelled_image_dir>
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+
+async def rebuild_index(args):
+    """Recompute the similar-case embedding index from detection_history"""
+    from models.disease_classifiers import DiseaseClassifiers
+    from models.model_registry import ModelRegistry
+    from services.similarity_index import SimilarityIndex
+    from utils.database import SessionLocal
+
+    # Embed with the same model versions the server is using
+    disease_classifiers = DiseaseClassifiers()
+    await ModelRegistry(state=None).load_all(disease_classifiers=disease_classifiers)
+
+    db = SessionLocal()
+    try:
+        counts = await SimilarityIndex(args.index_dir).rebuild(disease_classifiers, db)
+    finally:
+        db.close()
+
+    for crop_type, count in sorted(counts.items()):
+        print(f"✅ {crop_type}: {count} detections indexed")
+
+
+async def score(args):
+    """Score every image in a survey directory tree"""
+    from models.crop_detector import CropDetector
+    from models.disease_classifiers import DiseaseClassifiers
+    from models.model_registry import ModelRegistry
+    from services.bulk_scoring import BulkScorer, Checkpoint, ResultWriter
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.suffix.lower() == ".csv" else "jsonl"
+    if output_format != "db" and args.output is None:
+        raise SystemExit("--output is required unless --format db is used")
+    similarity_index = None
+    if output_format == "db":
+        from services.similarity_index import SimilarityIndex
+        from utils.database import init_db
+        await init_db()
+        # Detections written to the database are searchable as similar cases
+        similarity_index = SimilarityIndex()
+
+    crop_detector = CropDetector()
+    disease_classifiers = DiseaseClassifiers()
+    await ModelRegistry(state=None).load_all(crop_detector, disease_classifiers)
+
+    if args.checkpoint:
+        checkpoint_path = args.checkpoint
+    elif args.output:
+        checkpoint_path = args.output.with_name(args.output.name + ".checkpoint")
+    else:
+        checkpoint_path = args.image_dir / ".crop_doctor.checkpoint"
+
+    writer = ResultWriter(args.output, output_format, language=args.language)
+    try:
+        scorer = BulkScorer(
+            crop_detector, disease_classifiers, batch_size=args.batch_size, similarity_index=similarity_index
+        )
+        summary = await scorer.run(args.image_dir, writer, Checkpoint(checkpoint_path))
+    finally:
+        writer.close()
+
+    print(
+        f"✅ {summary['scored']} images scored in {summary['seconds']:.1f}s "
+        f"({summary['images_per_second']:.1f} images/s), "
+        f"{summary['failed']} failed, {summary['skipped']} skipped from checkpoint"
+    )
+
+
+async def train(args):
+    """Retrain a model's head from cached backbone features"""
+    import tensorflow as tf
+    from datetime import datetime
+    from models.crop_detector import CropDetector
+    from models.disease_classifiers import DiseaseClassifiers
+    from models.model_registry import CROP_DETECTOR, ModelRegistry
+    from services.head_training import HeadTrainer
+
+    if args.target == "crop":
+        name = CROP_DETECTOR
+        target = CropDetector()
+        preprocess = tf.keras.applications.mobilenet_v2.preprocess_input
+    else:
+        name = args.target
+        target = DiseaseClassifiers().get_classifier(args.target)
+        preprocess = tf.keras.applications.efficientnet.preprocess_input
+
+    # Start from the version being served, if the store has one
+    registry = ModelRegistry(state=None)
+    await registry.load(name, target)
+
+    version = args.version or datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    output = args.output or registry.version_path(name, version)
+    if output.exists():
+        raise SystemExit(f"{output} already exists")
+
+    trainer = HeadTrainer(args.target, target.model, target.class_names, preprocess, cache_dir=args.cache_dir)
+    summary = trainer.train(args.image_dir, epochs=args.epochs, batch_size=args.batch_size)
+    trainer.save(output)
+
+    final = {k: round(v[-1], 4) for k, v in summary["history"].items()}
+    print(f"✅ Trained on {summary['images']} images (backbone {summary['backbone_version']}): {final}")
+    if not args.output:
+        print(f"➡️ Activate with POST /api/admin/models/{name}/activate {{\"version\": \"{version}\"}}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Crop Doctor backend tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-index", help=rebuild_index.__doc__)
+    rebuild.add_argument("--index-dir", default=None, help="Override SIMILARITY_INDEX_DIR")
+    rebuild.set_defaults(handler=rebuild_index)
+
+    scoring = subparsers.add_parser("score", help=score.__doc__)
+    scoring.add_argument("image_dir", type=Path, help="Directory tree of survey images")
+    scoring.add_argument("--output", type=Path, default=None, help="JSONL or CSV results file")
+    scoring.add_argument("--format", choices=["jsonl", "csv", "db"], default=None,
+                         help="Output format; 'db' writes to detection_history (default: from --output extension)")
+    scoring.add_argument("--batch-size", type=int, default=64)
+    scoring.add_argument("--checkpoint", type=Path, default=None,
+                         help="Resume file of scored paths (default: <output>.checkpoint)")
+    scoring.add_argument("--language", default="en", help="Language stored with detection_history rows")
+    scoring.set_defaults(handler=score)
+
+    training = subparsers.add_parser("train", help=train.__doc__)
+    training.add_argument("target", choices=["crop", "maize", "cassava", "tomato"])
+    training.add_argument("image_dir", type=Path, help="Folder with one sub-folder of images per class")
+    training.add_argument("--epochs", type=int, default=20)
+    training.add_argument("--batch-size", type=int, default=64)
+    training.add_argument("--version", default=None, help="Version name in MODEL_STORE_DIR (default: UTC timestamp)")
+    training.add_argument("--output", type=Path, default=None, help="Write the .h5 here instead of the model store")
+    training.add_argument("--cache-dir", default=None, help="Override FEATURE_CACHE_DIR")
+    training.set_defaults(handler=train)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
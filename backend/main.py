@@ -1,13 +1,16 @@
 """Main FastAPI application"""
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import uvicorn
 
-from api.routes import detection, recommendations, history, languages
+from api.routes import detection, recommendations, history, languages, live, admin, jobs
 from utils.database import init_db
 from utils.config import settings
+from utils.upload import UploadSizeLimitMiddleware
+from utils.profiling import ProfilingMiddleware, RequestProfiler
+from utils.admission import admission_middleware, get_admission_controller, get_rate_limiter
 
 
 @asynccontextmanager
@@ -17,20 +20,29 @@ async def lifespan(app: FastAPI):
     await init_db()
     print("✅ Database initialized")
     
+    app.state.admission = get_admission_controller()
+    app.state.rate_limiter = get_rate_limiter()
+    
     # Load models
-    from models.crop_detector import CropDetector
-    from models.disease_classifiers import DiseaseClassifiers
+    from models.model_registry import ModelRegistry
+    
+    app.state.model_registry = ModelRegistry(app.state)
+    await app.state.model_registry.startup()
+    app.state.model_registry.start_watcher(settings.MODEL_WATCH_INTERVAL)
     
-    app.state.crop_detector = CropDetector()
-    app.state.disease_classifiers = DiseaseClassifiers()
+    from services.similarity_index import SimilarityIndex
+    app.state.similarity_index = SimilarityIndex()
     
-    await app.state.crop_detector.load_model()
-    await app.state.disease_classifiers.load_models()
+    from services.job_queue import JobQueue
+    app.state.job_queue = JobQueue(app.state)
+    await app.state.job_queue.start()
     
     print("✅ Models loaded")
     yield
     
     print("🛑 Shutting down AI Crop Doctor API...")
+    app.state.model_registry.stop_watcher()
+    app.state.job_queue.stop()
 
 
 app = FastAPI(
@@ -40,13 +52,29 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS middleware
+# Admission control for detection routes
+app.middleware("http")(admission_middleware)
+
+# Stop oversized uploads while they stream in
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.MAX_UPLOAD_BYTES,
+    overrides={"/api/jobs": settings.JOB_MAX_UPLOAD_BYTES}
+)
+
+# Opt-in request profiling (see /api/admin/profiling)
+app.state.profiler = RequestProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=app.state.profiler)
+
+# CORS middleware, added last so it is outermost and also covers the
+# 413/429/503 responses produced by the middlewares above
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Profile-Id"],
 )
 
 # Include routers
@@ -54,6 +82,9 @@ app.include_router(detection.router, prefix="/api/detect", tags=["Detection"])
 app.include_router(recommendations.router, prefix="/api/recommendations", tags=["Recommendations"])
 app.include_router(history.router, prefix="/api/history", tags=["History"])
 app.include_router(languages.router, prefix="/api/languages", tags=["Languages"])
+app.include_router(live.router, prefix="/api/live", tags=["Live"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -67,11 +98,13 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
     return JSONResponse({
         "status": "healthy",
-        "models_loaded": True
+        "models_loaded": True,
+        "model_versions": request.app.state.model_registry.active_versions(),
+        "inference_queue": request.app.state.admission.stats()
     })
 
 
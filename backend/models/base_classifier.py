@@ -1,7 +1,7 @@
 """Base classifier for disease detection"""
 import tensorflow as tf
 import numpy as np
-from typing import Dict
+from typing import Dict, Tuple
 from pathlib import Path
 
 
@@ -14,12 +14,15 @@ class BaseDiseaseClassifier:
         self.class_names = class_names
         self.severity_map = severity_map
         self.input_shape = input_shape
+        self.version = "builtin"
+        self.feature_model = None
     
     async def load_model(self):
         """Load pre-trained disease classifier"""
         try:
             if self.model_path.exists():
                 self.model = tf.keras.models.load_model(str(self.model_path))
+                self.feature_model = None
                 print(f"✅ Model loaded from {self.model_path}")
             else:
                 print(f"⚠️ Model not found: {self.model_path}, creating new model...")
@@ -62,6 +65,7 @@ class BaseDiseaseClassifier:
             loss='categorical_crossentropy',
             metrics=['accuracy']
         )
+        self.feature_model = None
         
         print(f"✅ New model created at {self.model_path}")
     
@@ -69,7 +73,10 @@ class BaseDiseaseClassifier:
         """Predict disease from image"""
         if self.model is None:
             await self.load_model()
-        
+        return self.predict_sync(image)
+    
+    def predict_sync(self, image: np.ndarray) -> Dict:
+        """Blocking prediction for worker threads; the model must already be loaded"""
         # Preprocess
         image_array = np.expand_dims(image, axis=0)
         image_array = tf.keras.applications.efficientnet.preprocess_input(image_array)
@@ -88,3 +95,56 @@ class BaseDiseaseClassifier:
             "severity": self.severity_map.get(disease, "medium")
         }
 
+    
+    async def predict_batch(self, images: np.ndarray, batch_size: int = 32) -> np.ndarray:
+        """Class probabilities for a batch of processed images"""
+        if self.model is None:
+            await self.load_model()
+        return self.predict_batch_sync(images, batch_size)
+    
+    def predict_batch_sync(self, images: np.ndarray, batch_size: int = 32) -> np.ndarray:
+        """Blocking predict_batch for worker threads; the model must already be loaded"""
+        image_array = tf.keras.applications.efficientnet.preprocess_input(images)
+        return self.model.predict(image_array, batch_size=batch_size, verbose=0)
+    
+    async def predict_batch_with_features(self, images: np.ndarray, batch_size: int = 32) -> Tuple[np.ndarray, np.ndarray]:
+        """Class probabilities and pooled feature vectors for a batch of processed images"""
+        if self.model is None:
+            await self.load_model()
+        if self.feature_model is None:
+            self._build_feature_model()
+        
+        image_array = tf.keras.applications.efficientnet.preprocess_input(images)
+        features, predictions = self.feature_model.predict(image_array, batch_size=batch_size, verbose=0)
+        return predictions, features
+    
+    def _build_feature_model(self):
+        """Model returning the pooled backbone features alongside the class probabilities"""
+        pooling = next(
+            layer for layer in self.model.layers
+            if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)
+        )
+        self.feature_model = tf.keras.Model(
+            inputs=self.model.inputs,
+            outputs=[pooling.output, self.model.output]
+        )
+    
+    async def predict_with_features(self, image: np.ndarray) -> Tuple[Dict, np.ndarray]:
+        """Predict disease and return the pooled feature vector from the same forward pass"""
+        if self.model is None:
+            await self.load_model()
+        if self.feature_model is None:
+            self._build_feature_model()
+        
+        image_array = np.expand_dims(image, axis=0)
+        image_array = tf.keras.applications.efficientnet.preprocess_input(image_array)
+        features, predictions = self.feature_model.predict(image_array, verbose=0)
+        
+        class_idx = np.argmax(predictions[0])
+        disease = self.class_names[class_idx]
+        
+        return {
+            "class": disease,
+            "confidence": float(predictions[0][class_idx]),
+            "severity": self.severity_map.get(disease, "medium")
+        }, features[0]
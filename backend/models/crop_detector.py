@@ -15,6 +15,7 @@ class CropDetector:
         self.model_path = Path(settings.CROP_DETECTOR_PATH)
         self.class_names = ["maize", "cassava", "tomato"]
         self.input_shape = (224, 224, 3)
+        self.version = "builtin"
     
     async def load_model(self):
         """Load pre-trained crop detection model"""
@@ -58,7 +59,10 @@ class CropDetector:
         """Predict crop type from image"""
         if self.model is None:
             await self.load_model()
-        
+        return self.predict_sync(image)
+    
+    def predict_sync(self, image: np.ndarray) -> Dict:
+        """Blocking prediction for worker threads; the model must already be loaded"""
         # Preprocess image
         image_array = np.expand_dims(image, axis=0)
         image_array = tf.keras.applications.mobilenet_v2.preprocess_input(image_array)
@@ -82,3 +86,12 @@ class CropDetector:
             "all_classes": all_classes
         }
 
+    
+    async def predict_batch(self, images: np.ndarray, batch_size: int = 32) -> np.ndarray:
+        """Class probabilities for a batch of processed images"""
+        if self.model is None:
+            await self.load_model()
+        
+        # preprocess_input scales numpy arrays in place; keep the caller's batch intact
+        image_array = tf.keras.applications.mobilenet_v2.preprocess_input(images.copy())
+        return self.model.predict(image_array, batch_size=batch_size, verbose=0)
@@ -19,3 +19,21 @@ class DetectionHistory(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+
+
+class DetectionJob(Base):
+    """Queued asynchronous detection job"""
+    __tablename__ = "detection_jobs"
+    
+    id = Column(String(36), primary_key=True, index=True)
+    kind = Column(String(20), nullable=False, default="full")
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    crop_type = Column(String(50), nullable=True)
+    language = Column(String(10), default="en")
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    results = Column(Text, nullable=True)  # JSON list, one entry per image
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime, nullable=True)
@@ -1,5 +1,7 @@
 """Disease classifiers manager"""
+import copy
 from typing import Dict, Optional
+from models.base_classifier import BaseDiseaseClassifier
 from models.maize_classifier import MaizeDiseaseClassifier
 from models.cassava_classifier import CassavaDiseaseClassifier
 from models.tomato_classifier import TomatoDiseaseClassifier
@@ -28,3 +30,9 @@ class DiseaseClassifiers:
             raise ValueError(f"Unknown crop type: {crop_type}. Supported: {list(self.classifiers.keys())}")
         return classifier
 
+    
+    def with_classifier(self, crop_type: str, classifier: BaseDiseaseClassifier) -> "DiseaseClassifiers":
+        """Copy of this manager with one classifier replaced"""
+        replaced = copy.copy(self)
+        replaced.classifiers = {**self.classifiers, crop_type: classifier}
+        return replaced
@@ -0,0 +1,197 @@
+"""Versioned model store with background loading and atomic swaps"""
+import asyncio
+import os
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from models.crop_detector import CropDetector
+from models.disease_classifiers import DiseaseClassifiers
+from utils.config import settings
+
+CROP_DETECTOR = "crop_detector"
+MODEL_FILENAME = "model.h5"
+ACTIVE_FILENAME = "ACTIVE"
+
+
+class ModelRegistry:
+    """
+    Loads model versions from <MODEL_STORE_DIR>/<model>/<version>/model.h5.
+
+    A new version is loaded and warmed up off the event loop, then swapped
+    into app.state by reference assignment, so in-flight requests finish on
+    the objects they already hold.
+    """
+
+    def __init__(self, state, store_dir: Optional[str] = None):
+        self.state = state
+        self.store_dir = Path(store_dir or settings.MODEL_STORE_DIR)
+        self.previous: Dict[str, object] = {}
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self._failed: Dict[str, str] = {}
+
+    @property
+    def model_names(self) -> List[str]:
+        return [CROP_DETECTOR, *self.state.disease_classifiers.classifiers]
+
+    def current(self, name: str):
+        if name == CROP_DETECTOR:
+            return self.state.crop_detector
+        return self.state.disease_classifiers.get_classifier(name)
+
+    def _new_instance(self, name: str):
+        if name == CROP_DETECTOR:
+            return CropDetector()
+        return type(self.current(name))()
+
+    def _swap(self, name: str, instance):
+        if name == CROP_DETECTOR:
+            self.state.crop_detector = instance
+        else:
+            self.state.disease_classifiers = self.state.disease_classifiers.with_classifier(name, instance)
+
+    def versions(self, name: str) -> List[str]:
+        """Versions available in the store for a model"""
+        model_dir = self.store_dir / name
+        if not model_dir.is_dir():
+            return []
+        return sorted(p.name for p in model_dir.iterdir() if (p / MODEL_FILENAME).exists())
+
+    def version_path(self, name: str, version: str) -> Path:
+        return self.store_dir / name / version / MODEL_FILENAME
+
+    def active_version(self, name: str) -> Optional[str]:
+        """Version recorded as active on disk"""
+        active_file = self.store_dir / name / ACTIVE_FILENAME
+        if not active_file.exists():
+            return None
+        return active_file.read_text(encoding="utf-8").strip() or None
+
+    def _write_active(self, name: str, version: Optional[str]):
+        active_file = self.store_dir / name / ACTIVE_FILENAME
+        if version is None:
+            if active_file.exists():
+                active_file.unlink()
+            return
+        active_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = active_file.with_suffix(".tmp")
+        tmp_file.write_text(version, encoding="utf-8")
+        os.replace(tmp_file, active_file)
+
+    async def startup(self):
+        """Create the models, preferring the active stored version over the configured path"""
+        self.state.crop_detector = CropDetector()
+        self.state.disease_classifiers = DiseaseClassifiers()
+        await self.load_all(self.state.crop_detector, self.state.disease_classifiers)
+
+    async def load(self, name: str, instance):
+        """
+        Load a model instance from its active stored version, falling back to
+        its configured path. The instance only reports a stored version once
+        that version has actually loaded.
+        """
+        version = self.active_version(name)
+        if version and self.version_path(name, version).exists():
+            try:
+                await asyncio.to_thread(self._load_into, instance, self.version_path(name, version), version)
+                return instance
+            except Exception as e:
+                print(f"❌ Could not load {name} version {version}: {e}; using the configured model")
+        await instance.load_model()
+        return instance
+
+    async def load_all(self, crop_detector: Optional[CropDetector] = None,
+                       disease_classifiers: Optional[DiseaseClassifiers] = None):
+        """Load the given models the way the server does; also used by the CLI tools"""
+        if crop_detector is not None:
+            await self.load(CROP_DETECTOR, crop_detector)
+        if disease_classifiers is not None:
+            for crop_type, classifier in disease_classifiers.classifiers.items():
+                await self.load(crop_type, classifier)
+
+    def _load_into(self, instance, path: Path, version: str):
+        """Load and warm up a stored version into an instance; runs in a worker thread"""
+        model = tf.keras.models.load_model(str(path))
+
+        # First predict call builds the graph; pay that cost before taking traffic,
+        # with the single-image batch the routes use
+        warmup_batch = np.zeros((1, *instance.input_shape), dtype=np.float32)
+        model.predict(warmup_batch, verbose=0)
+
+        # Only a fully loaded and warmed-up model changes the instance
+        instance.model = model
+        instance.model_path = path
+        instance.version = version
+        return instance
+
+    def _load_version(self, name: str, version: str):
+        """Load a stored version into a new instance; runs in a worker thread"""
+        return self._load_into(self._new_instance(name), self.version_path(name, version), version)
+
+    async def activate(self, name: str, version: str) -> Dict:
+        """Load a version in the background and swap it in"""
+        if name not in self.model_names:
+            raise ValueError(f"Unknown model: {name}. Supported: {self.model_names}")
+        if version not in self.versions(name):
+            raise ValueError(f"Version {version} not found for {name}")
+
+        async with self._lock:
+            instance = await asyncio.to_thread(self._load_version, name, version)
+            self.previous[name] = self.current(name)
+            self._swap(name, instance)
+            self._write_active(name, version)
+
+        print(f"✅ {name} switched to version {version}")
+        return self.status(name)
+
+    async def rollback(self, name: str) -> Dict:
+        """Swap the previously active instance back in"""
+        async with self._lock:
+            previous = self.previous.get(name)
+            if previous is None:
+                raise ValueError(f"No previous version of {name} to roll back to")
+            self.previous[name] = self.current(name)
+            self._swap(name, previous)
+            self._write_active(name, previous.version if previous.version in self.versions(name) else None)
+
+        print(f"↩️ {name} rolled back to version {previous.version}")
+        return self.status(name)
+
+    def status(self, name: str) -> Dict:
+        previous = self.previous.get(name)
+        return {
+            "model": name,
+            "active": self.current(name).version,
+            "previous": previous.version if previous is not None else None,
+            "available": self.versions(name)
+        }
+
+    def active_versions(self) -> Dict[str, str]:
+        return {name: self.current(name).version for name in self.model_names}
+
+    async def _watch(self, interval: float):
+        """Activate versions whose ACTIVE file was changed on disk"""
+        while True:
+            await asyncio.sleep(interval)
+            for name in self.model_names:
+                version = self.active_version(name)
+                if not version or version == self.current(name).version or self._failed.get(name) == version:
+                    continue
+                try:
+                    await self.activate(name, version)
+                    self._failed.pop(name, None)
+                except Exception as e:
+                    # Don't retry the same broken version on every poll
+                    self._failed[name] = version
+                    print(f"⚠️ Could not activate {name} version {version}: {e}")
+
+    def start_watcher(self, interval: float):
+        if interval > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
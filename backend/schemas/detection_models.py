@@ -10,6 +10,7 @@ class DetectionResponse(BaseModel):
     confidence: float
     severity: str
     recommendations: Dict
+    model_versions: Dict[str, str] = {}
 
 
 class CropDetectionResponse(BaseModel):
@@ -17,6 +18,7 @@ class CropDetectionResponse(BaseModel):
     crop_type: str
     confidence: float
     crops: Dict[str, float]
+    model_versions: Dict[str, str] = {}
 
 
 class BatchDetectionResponse(BaseModel):
@@ -26,3 +28,24 @@ class BatchDetectionResponse(BaseModel):
     successful: int
     failed: int
 
+
+
+class TileResult(BaseModel):
+    """Prediction for a single tile"""
+    disease: str
+    confidence: float
+
+
+class TiledDetectionResponse(BaseModel):
+    """Response model for tiled high-resolution analysis"""
+    crop_type: str
+    rows: int
+    cols: int
+    tile_size: int
+    stride: int
+    grid: List[List[TileResult]]
+    disease_fractions: Dict[str, float]
+    affected_fraction: float
+    dominant_disease: str
+    severity: str
+    model_versions: Dict[str, str] = {}
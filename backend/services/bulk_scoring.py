@@ -0,0 +1,224 @@
+"""Offline bulk scoring of image survey directories"""
+import csv
+import json
+import time
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models.crop_detector import CropDetector
+from models.disease_classifiers import DiseaseClassifiers
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+
+
+def find_images(root: Path) -> List[str]:
+    """All image files under root, in a stable order"""
+    return sorted(
+        str(path) for path in root.rglob("*")
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def build_dataset(paths: List[str], batch_size: int, target_size=(224, 224)) -> tf.data.Dataset:
+    """Parallel decode + resize pipeline yielding (paths, images) batches"""
+
+    def load(path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, target_size, method="lanczos3", antialias=True)
+        # Same [0, 1] range as process_image
+        image = tf.clip_by_value(image, 0.0, 255.0) / 255.0
+        return path, image
+
+    return (
+        tf.data.Dataset.from_tensor_slices(paths)
+        .map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+        .ignore_errors()
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+class Checkpoint:
+    """Append-only list of image paths that have already been scored"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+
+    def mark(self, paths: Iterable[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for path in paths:
+                f.write(path + "\n")
+                self.done.add(path)
+
+
+class ResultWriter:
+    """Streams results to JSONL, CSV or detection_history"""
+
+    FIELDS = ["image_path", "crop_type", "crop_confidence", "disease", "confidence", "severity", "error"]
+
+    def __init__(self, output: Optional[Path], output_format: str, language: str = "en"):
+        self.output_format = output_format
+        self.language = language
+        self._file = None
+        self._csv = None
+        self._db = None
+
+        if output_format == "db":
+            from utils.database import SessionLocal
+            self._db = SessionLocal()
+        else:
+            write_header = output_format == "csv" and (not output.exists() or output.stat().st_size == 0)
+            self._file = open(output, "a", encoding="utf-8", newline="")
+            if output_format == "csv":
+                self._csv = csv.DictWriter(self._file, fieldnames=self.FIELDS)
+                if write_header:
+                    self._csv.writeheader()
+
+    def write(self, results: List[Dict]) -> Optional[List[int]]:
+        """Write scored results; for the database, returns the new detection ids in order"""
+        if self._db is not None:
+            from models.database_models import DetectionHistory
+            rows = [
+                {
+                    "crop_type": r["crop_type"],
+                    "disease": r["disease"],
+                    "confidence": r["confidence"],
+                    "severity": r["severity"],
+                    "image_path": r["image_path"],
+                    "language": self.language
+                }
+                for r in results
+            ]
+            self._db.bulk_insert_mappings(DetectionHistory, rows, return_defaults=True)
+            self._db.commit()
+            return [row["id"] for row in rows]
+        elif self._csv is not None:
+            self._csv.writerows(results)
+            self._file.flush()
+        else:
+            for r in results:
+                self._file.write(json.dumps(r) + "\n")
+            self._file.flush()
+        return None
+
+    def write_errors(self, paths: List[str], error: str):
+        """One record per image that could not be scored"""
+        if self._db is not None:
+            # detection_history has no place for failures, so list them on the console
+            for path in paths:
+                print(f"⚠️ {path}: {error}")
+            return
+        self.write([{"image_path": path, "error": error} for path in paths])
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class BulkScorer:
+    """
+    Scores a directory tree with large-batch crop + disease inference.
+    With a similarity index, the pooled features from the same disease pass
+    are added to it for every detection written to the database.
+    """
+
+    def __init__(self, crop_detector: CropDetector, disease_classifiers: DiseaseClassifiers,
+                 batch_size: int = 64, similarity_index=None):
+        self.crop_detector = crop_detector
+        self.disease_classifiers = disease_classifiers
+        self.batch_size = batch_size
+        self.similarity_index = similarity_index
+
+    async def score_batch(self, paths: List[str], images: np.ndarray) -> Tuple[List[Dict], List[Optional[np.ndarray]]]:
+        """
+        Crop detection for the whole batch, then one disease pass per detected crop.
+        Returns the results and, when indexing, each image's feature vector.
+        """
+        crop_probabilities = await self.crop_detector.predict_batch(images, batch_size=self.batch_size)
+        crop_idx = crop_probabilities.argmax(axis=1)
+
+        results: List[Optional[Dict]] = [None] * len(paths)
+        features: List[Optional[np.ndarray]] = [None] * len(paths)
+        for i, crop_type in enumerate(self.crop_detector.class_names):
+            rows = np.flatnonzero(crop_idx == i)
+            if len(rows) == 0:
+                continue
+
+            classifier = self.disease_classifiers.get_classifier(crop_type)
+            if self.similarity_index is not None:
+                disease_probabilities, crop_features = await classifier.predict_batch_with_features(
+                    images[rows], batch_size=self.batch_size
+                )
+                for row, vector in zip(rows, crop_features):
+                    features[row] = vector
+            else:
+                disease_probabilities = await classifier.predict_batch(images[rows], batch_size=self.batch_size)
+            disease_idx = disease_probabilities.argmax(axis=1)
+
+            for row, probabilities, idx in zip(rows, disease_probabilities, disease_idx):
+                disease = classifier.class_names[idx]
+                results[row] = {
+                    "image_path": paths[row],
+                    "crop_type": crop_type,
+                    "crop_confidence": float(crop_probabilities[row, i]),
+                    "disease": disease,
+                    "confidence": float(probabilities[idx]),
+                    "severity": classifier.severity_map.get(disease, "medium")
+                }
+        return results, features
+
+    def _index(self, results: List[Dict], features: List[np.ndarray], detection_ids: List[int]):
+        """Add newly stored detections to the similar-case index, one append per crop"""
+        by_crop: Dict[str, Tuple[List[int], List[np.ndarray]]] = {}
+        for result, vector, detection_id in zip(results, features, detection_ids):
+            ids, vectors = by_crop.setdefault(result["crop_type"], ([], []))
+            ids.append(detection_id)
+            vectors.append(vector)
+        for crop_type, (ids, vectors) in by_crop.items():
+            self.similarity_index.get(crop_type).add(ids, np.stack(vectors))
+
+    async def run(self, root: Path, writer: ResultWriter, checkpoint: Checkpoint, report_every: float = 10.0) -> Dict:
+        """Score every image under root not already in the checkpoint"""
+        all_paths = find_images(root)
+        paths = [p for p in all_paths if p not in checkpoint.done]
+        print(f"🌾 {len(all_paths)} images found, {len(all_paths) - len(paths)} already scored")
+
+        scored = 0
+        started = last_report = time.perf_counter()
+        if paths:
+            for path_batch, image_batch in build_dataset(paths, self.batch_size):
+                batch_paths = [p.decode("utf-8") for p in path_batch.numpy()]
+                results, features = await self.score_batch(batch_paths, image_batch.numpy())
+                detection_ids = writer.write(results)
+                if self.similarity_index is not None and detection_ids is not None:
+                    self._index(results, features, detection_ids)
+                checkpoint.mark(batch_paths)
+                scored += len(batch_paths)
+
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    print(f"⏱️ {scored}/{len(paths)} images, {scored / (now - started):.1f} images/s")
+                    last_report = now
+
+        elapsed = time.perf_counter() - started
+        # Images that failed to decode are dropped by the pipeline; record them so a resume skips them
+        failed = sorted(set(paths) - checkpoint.done)
+        if failed:
+            writer.write_errors(failed, "Could not decode image")
+            checkpoint.mark(failed)
+
+        return {
+            "scored": scored,
+            "failed": len(failed),
+            "skipped": len(all_paths) - len(paths),
+            "seconds": elapsed,
+            "images_per_second": scored / elapsed if elapsed > 0 else 0.0
+        }
@@ -0,0 +1,180 @@
+"""Head retraining from cached backbone features"""
+import hashlib
+import os
+import numpy as np
+import tensorflow as tf
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.bulk_scoring import IMAGE_EXTENSIONS, build_dataset
+from utils.config import settings
+
+HASH_BYTES = 32
+
+
+def hash_file(path: Path) -> bytes:
+    """SHA-256 of an image file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def backbone_version(model: tf.keras.Model) -> str:
+    """Short fingerprint of the frozen backbone weights"""
+    digest = hashlib.sha1()
+    for weights in model.layers[0].get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def split_model(model: tf.keras.Model) -> Tuple[tf.keras.Model, List[tf.keras.layers.Layer]]:
+    """Split a backbone + pooling + Dense-head model into a feature extractor and its head layers"""
+    pooling_idx = next(
+        i for i, layer in enumerate(model.layers)
+        if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)
+    )
+    extractor = tf.keras.Model(inputs=model.inputs, outputs=model.layers[pooling_idx].output)
+    return extractor, model.layers[pooling_idx + 1:]
+
+
+class FeatureStore:
+    """
+    Memory-mapped float16 feature matrix keyed by image hash, for one
+    model and backbone version. Rows are only ever appended.
+
+    Features and hashes are appended to separate files, so an interrupted
+    run can leave one longer than the other; opening the store truncates
+    both to the rows they have in common, keeping later appends aligned.
+    """
+
+    def __init__(self, root: Path, dim: int):
+        self.features_path = root / "features.f16"
+        self.hashes_path = root / "hashes.bin"
+        self.dim = dim
+        root.mkdir(parents=True, exist_ok=True)
+
+        hashes = self.hashes_path.read_bytes() if self.hashes_path.exists() else b""
+        feature_rows = self.features_path.stat().st_size // (2 * dim) if self.features_path.exists() else 0
+        self.count = min(len(hashes) // HASH_BYTES, feature_rows)
+        for path, row_bytes in ((self.features_path, 2 * dim), (self.hashes_path, HASH_BYTES)):
+            if path.exists() and path.stat().st_size != self.count * row_bytes:
+                os.truncate(path, self.count * row_bytes)
+
+        self.rows: Dict[bytes, int] = {}
+        for row in range(self.count):
+            self.rows[hashes[row * HASH_BYTES:(row + 1) * HASH_BYTES]] = row
+
+    def __contains__(self, image_hash: bytes) -> bool:
+        return image_hash in self.rows
+
+    def add(self, image_hashes: List[bytes], features: np.ndarray):
+        with open(self.features_path, "ab") as f:
+            f.write(np.asarray(features, dtype=np.float16).tobytes())
+        with open(self.hashes_path, "ab") as f:
+            for image_hash in image_hashes:
+                self.rows[image_hash] = self.count
+                self.count += 1
+                f.write(image_hash)
+
+    def get(self, image_hashes: List[bytes]) -> np.ndarray:
+        """Features for the given hashes as float32"""
+        if not image_hashes:
+            raise ValueError("No cached features to load: none of the images could be decoded")
+        features = np.memmap(self.features_path, dtype=np.float16, mode="r", shape=(self.count, self.dim))
+        return np.asarray(features[[self.rows[h] for h in image_hashes]], dtype=np.float32)
+
+
+class HeadTrainer:
+    """Trains the Dense head of a transfer-learning model from cached backbone features"""
+
+    def __init__(
+        self,
+        name: str,
+        model: tf.keras.Model,
+        class_names: List[str],
+        preprocess: Callable[[np.ndarray], np.ndarray],
+        cache_dir: Optional[str] = None
+    ):
+        self.model = model
+        self.class_names = class_names
+        self.preprocess = preprocess
+        self.extractor, self.head_layers = split_model(model)
+        self.version = backbone_version(model)
+        self.store = FeatureStore(
+            Path(cache_dir or settings.FEATURE_CACHE_DIR) / name / self.version,
+            dim=self.extractor.output_shape[-1]
+        )
+
+    def collect(self, image_dir: Path) -> Tuple[List[Path], List[int]]:
+        """Labelled images from <image_dir>/<class_name>/* folders"""
+        paths, labels = [], []
+        for class_dir in sorted(p for p in image_dir.iterdir() if p.is_dir()):
+            if class_dir.name not in self.class_names:
+                print(f"⚠️ Skipping unknown class folder: {class_dir.name}")
+                continue
+            label = self.class_names.index(class_dir.name)
+            for path in sorted(class_dir.rglob("*")):
+                if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                    paths.append(path)
+                    labels.append(label)
+        return paths, labels
+
+    def extract(self, paths: List[Path], batch_size: int = 64) -> Dict[Path, bytes]:
+        """Run the backbone over images not yet in the store; returns each path's hash"""
+        hashes = {path: hash_file(path) for path in paths}
+        missing, seen = [], set()
+        for path, image_hash in hashes.items():
+            if image_hash not in self.store and image_hash not in seen:
+                missing.append(str(path))
+                seen.add(image_hash)
+
+        print(f"🧠 {len(paths) - len(missing)} images cached, extracting features for {len(missing)}")
+        if missing:
+            for path_batch, image_batch in build_dataset(missing, batch_size):
+                features = self.extractor.predict(self.preprocess(image_batch.numpy()), verbose=0)
+                self.store.add([hashes[Path(p.decode("utf-8"))] for p in path_batch.numpy()], features)
+        return hashes
+
+    def train(self, image_dir: Path, epochs: int = 20, batch_size: int = 64,
+              validation_split: float = 0.1, seed: int = 0) -> Dict:
+        """Extract missing features, then fit the head on the cached matrix"""
+        paths, labels = self.collect(image_dir)
+        if not paths:
+            raise ValueError(f"No labelled images found in {image_dir}")
+
+        hashes = self.extract(paths, batch_size)
+
+        # Images that failed to decode never reach the store
+        usable = [(hashes[p], label) for p, label in zip(paths, labels) if hashes[p] in self.store]
+        # Keras takes the validation split from the end before shuffling, and
+        # the rows are grouped by class folder, so shuffle them first
+        order = np.random.default_rng(seed).permutation(len(usable))
+        usable = [usable[i] for i in order]
+        features = self.store.get([h for h, _ in usable])
+        targets = tf.keras.utils.to_categorical([label for _, label in usable], len(self.class_names))
+
+        # Reuses the model's own head layers, so training updates the full model in place
+        head = tf.keras.Sequential([tf.keras.Input(shape=(self.store.dim,)), *self.head_layers])
+        head.compile(optimizer="adam", loss="categorical_crossentropy", metrics=["accuracy"])
+        history = head.fit(
+            features, targets,
+            epochs=epochs,
+            batch_size=batch_size,
+            validation_split=validation_split if len(usable) >= 10 else 0.0,
+            shuffle=True,
+            verbose=2
+        )
+
+        return {
+            "images": len(usable),
+            "backbone_version": self.version,
+            "history": {k: [float(v) for v in values] for k, values in history.history.items()}
+        }
+
+    def save(self, output: Path):
+        """Write the full model as .h5 for the existing loaders"""
+        output.parent.mkdir(parents=True, exist_ok=True)
+        self.model.save(str(output))
+        print(f"✅ Model saved to {output}")
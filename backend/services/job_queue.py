@@ -0,0 +1,303 @@
+"""SQLite-backed queue of asynchronous detection jobs"""
+import asyncio
+import json
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from sqlalchemy import literal_column
+
+from models.database_models import DetectionJob
+from services.recommendation_service import RecommendationService
+from services.tiled_analysis_service import TiledAnalysisService
+from utils.config import settings
+from utils.database import SessionLocal
+from utils.image_processor import process_image
+
+JOB_KINDS = ["full", "tiled"]
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def job_to_dict(job: DetectionJob, include_results: bool = True) -> Dict:
+    """Public representation of a job row"""
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "crop_type": job.crop_type,
+        "total": job.total,
+        "completed": job.completed,
+        "progress": job.completed / job.total if job.total else 0.0,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+    if include_results and job.status in TERMINAL_STATUSES:
+        data["results"] = json.loads(job.results) if job.results else []
+    return data
+
+
+class JobQueue:
+    """
+    Persists submitted jobs in detection_jobs and their images under JOBS_DIR,
+    and runs them on a pool of background workers. Decoding, inference and
+    database writes run in worker threads so the serving event loop stays
+    responsive. Per-image results are saved as they complete, so a restart
+    resumes where the job left off.
+    """
+
+    def __init__(self, state, jobs_dir: Optional[str] = None):
+        self.state = state
+        self.jobs_dir = Path(jobs_dir or settings.JOBS_DIR)
+        self._wakeup = asyncio.Event()
+        self._listeners: Dict[str, List[asyncio.Event]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, workers: Optional[int] = None):
+        """Requeue jobs interrupted by a restart and start the workers"""
+        db = SessionLocal()
+        try:
+            db.query(DetectionJob).filter(DetectionJob.status == "running").update({"status": "queued"})
+            db.commit()
+        finally:
+            db.close()
+
+        for _ in range(workers or settings.JOB_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def submit(self, files: List[UploadFile], kind: str, crop_type: Optional[str], language: str) -> DetectionJob:
+        """Copy the validated uploads to disk and queue a job, off the event loop"""
+        job = await asyncio.to_thread(self._store, files, kind, crop_type, language)
+        self._wakeup.set()
+        return job
+
+    def _store(self, files: List[UploadFile], kind: str, crop_type: Optional[str], language: str) -> DetectionJob:
+        job_id = str(uuid.uuid4())
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for index, file in enumerate(files):
+                file.file.seek(0)
+                with open(job_dir / f"{index:05d}", "wb") as out:
+                    shutil.copyfileobj(file.file, out)
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        db = SessionLocal()
+        try:
+            job = DetectionJob(
+                id=job_id,
+                kind=kind,
+                status="queued",
+                crop_type=crop_type,
+                language=language,
+                total=len(files),
+                completed=0
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        finally:
+            db.close()
+        return job
+
+    def get(self, job_id: str) -> Optional[DetectionJob]:
+        db = SessionLocal()
+        try:
+            return db.query(DetectionJob).filter(DetectionJob.id == job_id).first()
+        finally:
+            db.close()
+
+    async def wait_for_update(self, job_id: str, timeout: float):
+        """Wait until the job reports progress, or the timeout passes"""
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            listeners = self._listeners.get(job_id, [])
+            if event in listeners:
+                listeners.remove(event)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    def _notify(self, job_id: str):
+        for event in self._listeners.get(job_id, []):
+            event.set()
+
+    def _claim(self) -> Optional[str]:
+        """Atomically move the oldest queued job to running"""
+        db = SessionLocal()
+        try:
+            while True:
+                # created_at only has second resolution; SQLite's rowid keeps submission order
+                job = (
+                    db.query(DetectionJob.id)
+                    .filter(DetectionJob.status == "queued")
+                    .order_by(literal_column("detection_jobs.rowid"))
+                    .first()
+                )
+                if job is None:
+                    return None
+                claimed = (
+                    db.query(DetectionJob)
+                    .filter(DetectionJob.id == job.id, DetectionJob.status == "queued")
+                    .update({"status": "running"})
+                )
+                db.commit()
+                if claimed:
+                    return job.id
+        finally:
+            db.close()
+
+    async def _worker(self):
+        while True:
+            job_id = await asyncio.to_thread(self._claim)
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"⚠️ Job {job_id} failed: {e}")
+                await self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+
+    def _write(self, job_id: str, fields: Dict):
+        db = SessionLocal()
+        try:
+            db.query(DetectionJob).filter(DetectionJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _update(self, job_id: str, **fields):
+        await asyncio.to_thread(self._write, job_id, fields)
+        self._notify(job_id)
+
+    async def _run(self, job_id: str):
+        job = await asyncio.to_thread(self.get, job_id)
+        results = json.loads(job.results) if job.results else []
+        job_dir = self.jobs_dir / job_id
+        images = sorted(job_dir.iterdir()) if job_dir.exists() else []
+        recommendation_service = RecommendationService()
+
+        # Resume after the images that were already scored
+        for path in images[len(results):]:
+            try:
+                results.append(await self._process(job, path, recommendation_service))
+            except Exception as e:
+                results.append({"error": str(e)})
+            await self._update(job_id, completed=len(results), results=json.dumps(results))
+
+        await self._update(job_id, status="completed", finished_at=datetime.utcnow())
+        await asyncio.to_thread(shutil.rmtree, job_dir, ignore_errors=True)
+
+    async def _inference_slot(self, run):
+        """
+        Run blocking inference in a worker thread under the shared admission
+        controller, waiting while it is full
+        """
+        admission = self.state.admission
+        while True:
+            try:
+                async with admission.acquire():
+                    return await asyncio.to_thread(run)
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+            await asyncio.sleep(admission.retry_after)
+
+    async def _process(self, job: DetectionJob, path: Path, recommendation_service: RecommendationService) -> Dict:
+        """Score one image of a job"""
+        with Image.open(path) as image:
+            if job.kind == "tiled":
+                tiled_service = TiledAnalysisService()
+
+                def run():
+                    prepared = tiled_service.prepare(image)
+                    crop_type, model_versions = job.crop_type, {}
+                    if not crop_type:
+                        crop_detector = self.state.crop_detector
+                        crop_prediction = crop_detector.predict_sync(process_image(prepared, target_size=(224, 224)))
+                        crop_type = crop_prediction["class"]
+                        model_versions["crop_detector"] = crop_detector.version
+                    classifier = self.state.disease_classifiers.get_classifier(crop_type)
+                    analysis = tiled_service.analyze_sync(prepared, classifier)
+                    model_versions[crop_type] = classifier.version
+                    return {"crop_type": crop_type, "model_versions": model_versions, **analysis}
+
+                return await self._inference_slot(run)
+
+            image.draft("RGB", (224, 224))
+
+            def run():
+                processed_image = process_image(image, target_size=(224, 224))
+                crop_type, model_versions = job.crop_type, {}
+                if not crop_type:
+                    crop_detector = self.state.crop_detector
+                    crop_prediction = crop_detector.predict_sync(processed_image)
+                    crop_type = crop_prediction["class"]
+                    model_versions["crop_detector"] = crop_detector.version
+                classifier = self.state.disease_classifiers.get_classifier(crop_type)
+                disease_prediction = classifier.predict_sync(processed_image)
+                model_versions[crop_type] = classifier.version
+                return crop_type, disease_prediction, model_versions
+
+            crop_type, disease_prediction, model_versions = await self._inference_slot(run)
+            recommendations = await recommendation_service.get_recommendations(
+                crop_type, disease_prediction["class"], job.language
+            )
+            return {
+                "crop_type": crop_type,
+                "disease": disease_prediction["class"],
+                "confidence": disease_prediction["confidence"],
+                "severity": disease_prediction["severity"],
+                "recommendations": recommendations,
+                "model_versions": model_versions
+            }
+
+    def cleanup(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        db = SessionLocal()
+        try:
+            expired = (
+                db.query(DetectionJob)
+                .filter(DetectionJob.status.in_(TERMINAL_STATUSES), DetectionJob.finished_at < cutoff)
+                .all()
+            )
+            for job in expired:
+                shutil.rmtree(self.jobs_dir / job.id, ignore_errors=True)
+                db.delete(job)
+            db.commit()
+            return len(expired)
+        finally:
+            db.close()
+
+    async def _cleanup_loop(self):
+        while True:
+            try:
+                removed = self.cleanup()
+                if removed:
+                    print(f"🧹 Removed {removed} expired jobs")
+            except Exception as e:
+                print(f"⚠️ Job cleanup failed: {e}")
+            await asyncio.sleep(settings.JOB_CLEANUP_INTERVAL_SECONDS)
@@ -0,0 +1,298 @@
+"""Embedding index of past detections for similar-case search"""
+import asyncio
+import json
+import os
+import shutil
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from utils.config import settings
+from utils.image_processor import process_image, decode_base64_image
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class CropEmbeddingIndex:
+    """
+    Append-only matrix of L2-normalised float16 embeddings for one crop.
+    Vectors live in a raw file that is memory-mapped for search, with the
+    matching detection ids in a parallel int64 file, and the vector width in
+    a small metadata file. Deleted detections are recorded in a third file
+    and skipped until the next rebuild.
+
+    The two data files are appended separately, so a crash or a concurrent
+    writer can leave one a row ahead of the other. Readers only use the rows
+    present in both, and writers truncate the extra rows before appending.
+    """
+
+    def __init__(self, index_dir: Path, crop_type: str):
+        self.vectors_path = index_dir / f"{crop_type}.f16"
+        self.ids_path = index_dir / f"{crop_type}.ids"
+        self.deleted_path = index_dir / f"{crop_type}.deleted"
+        self.meta_path = index_dir / f"{crop_type}.meta.json"
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.ndarray] = None
+        self._deleted = np.empty(0, dtype=np.int64)
+        self._signature = None
+        self._ann = None
+        self._ann_rows = 0
+        # Searches run in worker threads; this guards the mapping and the ANN index
+        self._lock = threading.Lock()
+
+    def _stored_dim(self) -> Optional[int]:
+        """Vector width from the metadata file, inferred for indexes written without one"""
+        if self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["dim"])
+        id_rows = self.ids_path.stat().st_size // 8 if self.ids_path.exists() else 0
+        if id_rows == 0 or not self.vectors_path.exists():
+            return None
+        return self.vectors_path.stat().st_size // (2 * id_rows)
+
+    def _rows(self, dim: Optional[int]) -> int:
+        """Rows present in both the ids and the vectors file"""
+        if dim is None or not self.ids_path.exists() or not self.vectors_path.exists():
+            return 0
+        return min(self.ids_path.stat().st_size // 8, self.vectors_path.stat().st_size // (2 * dim))
+
+    def __len__(self) -> int:
+        return self._rows(self._stored_dim())
+
+    @staticmethod
+    def _file_signature(path: Path):
+        if not path.exists():
+            return None
+        stat = path.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Memory-map the stored vectors, remapping only when the files changed.
+        A replaced or shrunk file (e.g. after a rebuild by the CLI) also drops
+        the approximate index, which can only be extended.
+        """
+        ids_signature = self._file_signature(self.ids_path)
+        signature = (
+            ids_signature,
+            self._file_signature(self.vectors_path),
+            self._file_signature(self.deleted_path)
+        )
+        if signature == self._signature:
+            return self._vectors, self._ids
+
+        previous = self._signature[0] if self._signature else None
+        if previous is None or ids_signature is None or \
+                previous[0] != ids_signature[0] or ids_signature[2] < previous[2]:
+            self._ann = None
+            self._ann_rows = 0
+
+        self.dim = self._stored_dim()
+        rows = self._rows(self.dim)
+        if rows == 0:
+            self._vectors = np.empty((0, 0), dtype=np.float16)
+            self._ids = np.empty(0, dtype=np.int64)
+        else:
+            self._ids = np.fromfile(self.ids_path, dtype=np.int64, count=rows)
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+        self._deleted = (
+            np.fromfile(self.deleted_path, dtype=np.int64)
+            if self.deleted_path.exists() else np.empty(0, dtype=np.int64)
+        )
+        self._signature = signature
+        return self._vectors, self._ids
+
+    def add(self, detection_ids: List[int], vectors: np.ndarray):
+        """Append embeddings for stored detections"""
+        vectors = np.atleast_2d(vectors).astype(np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self.vectors_path.parent.mkdir(parents=True, exist_ok=True)
+            dim = self._stored_dim()
+            if dim is None:
+                dim = vectors.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": dim}, f)
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"Embedding width {vectors.shape[1]} does not match index width {dim}; rebuild the index")
+            self._append(detection_ids, vectors, dim)
+
+    def _append(self, detection_ids: List[int], vectors: np.ndarray, dim: int):
+        # Drop rows left over from a torn append so the new rows line up
+        rows = self._rows(dim)
+        for path, row_bytes in ((self.vectors_path, 2 * dim), (self.ids_path, 8)):
+            if path.exists() and path.stat().st_size != rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        with open(self.ids_path, "ab") as f:
+            f.write(np.asarray(detection_ids, dtype=np.int64).tobytes())
+
+    def remove(self, detection_id: int):
+        """Record a deleted detection so searches skip it"""
+        if not self.ids_path.exists():
+            return
+        with open(self.deleted_path, "ab") as f:
+            f.write(np.asarray([detection_id], dtype=np.int64).tobytes())
+
+    def vector_for(self, detection_id: int) -> Optional[np.ndarray]:
+        """Stored embedding of a detection, if indexed"""
+        with self._lock:
+            vectors, ids = self._load()
+            rows = np.flatnonzero(ids == detection_id)
+            if len(rows) == 0 or detection_id in self._deleted:
+                return None
+            return np.asarray(vectors[rows[-1]], dtype=np.float32)
+
+    def search(self, query: np.ndarray, k: int, exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (detection_id, cosine similarity) pairs for a query vector.
+        This can take seconds when the ANN index is first built, so call it
+        from a worker thread.
+        """
+        with self._lock:
+            return self._search(query, k, exclude_id)
+
+    def _search(self, query: np.ndarray, k: int, exclude_id: Optional[int]) -> List[Tuple[int, float]]:
+        vectors, ids = self._load()
+        if len(ids) == 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        skipped = set(self._deleted.tolist())
+        if exclude_id is not None:
+            skipped.add(exclude_id)
+        # Fetch enough extra rows that skipped ones cannot leave fewer than k results
+        wanted = min(k + len(skipped), len(ids))
+
+        if faiss is not None and len(ids) >= settings.SIMILARITY_ANN_MIN_ROWS:
+            scores, rows = self._ann_search(vectors, query, wanted)
+        else:
+            scores, rows = self._exact_search(vectors, query, wanted)
+
+        return [
+            (int(ids[row]), float(score))
+            for row, score in zip(rows, scores)
+            if 0 <= row < len(ids) and int(ids[row]) not in skipped
+        ][:k]
+
+    def _exact_search(self, vectors: np.ndarray, query: np.ndarray, k: int):
+        """Vectorised dot products over the memory map, chunked to bound memory"""
+        chunk_rows = settings.SIMILARITY_CHUNK_ROWS
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), chunk_rows):
+            chunk = vectors[start:start + chunk_rows]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], top
+
+    def _ann_search(self, vectors: np.ndarray, query: np.ndarray, k: int):
+        """HNSW search, adding only rows appended since the last query"""
+        if self._ann is None:
+            self._ann = faiss.IndexHNSWFlat(vectors.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            self._ann_rows = 0
+        if self._ann_rows < len(vectors):
+            self._ann.add(np.asarray(vectors[self._ann_rows:], dtype=np.float32))
+            self._ann_rows = len(vectors)
+
+        scores, rows = self._ann.search(query[np.newaxis, :], k)
+        return scores[0], rows[0]
+
+
+class SimilarityIndex:
+    """Per-crop embedding indexes of stored detections"""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = Path(index_dir or settings.SIMILARITY_INDEX_DIR)
+        self.indexes: Dict[str, CropEmbeddingIndex] = {}
+
+    def get(self, crop_type: str) -> CropEmbeddingIndex:
+        crop_type = crop_type.lower()
+        if crop_type not in self.indexes:
+            self.indexes[crop_type] = CropEmbeddingIndex(self.index_dir, crop_type)
+        return self.indexes[crop_type]
+
+    def add(self, crop_type: str, detection_id: int, vector: np.ndarray):
+        self.get(crop_type).add([detection_id], vector)
+
+    def search(self, crop_type: str, query: np.ndarray, k: int = 5,
+               exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        return self.get(crop_type).search(query, k, exclude_id)
+
+    async def embed(self, disease_classifiers, crop_type: str, image: Image.Image) -> np.ndarray:
+        """Pooled backbone features of a stored image"""
+        image = process_image(image, target_size=(224, 224))
+        classifier = disease_classifiers.get_classifier(crop_type)
+        _, features = await classifier.predict_with_features(image)
+        return features
+
+    @staticmethod
+    def _stored_image(detection) -> Optional[Image.Image]:
+        """A detection's image: inline base64 data, or the file recorded by bulk scoring"""
+        if detection.image_data:
+            return decode_base64_image(detection.image_data)
+        if detection.image_path:
+            with Image.open(detection.image_path) as image:
+                image.draft("RGB", (224, 224))
+                image.load()
+                return image
+        return None
+
+    async def index_detection(self, disease_classifiers, detection) -> bool:
+        """Add a stored detection to its crop's index; returns False if it has no image"""
+        image = self._stored_image(detection)
+        if image is None:
+            return False
+        vector = await self.embed(disease_classifiers, detection.crop_type, image)
+        # May wait on a search that is building the ANN index
+        await asyncio.to_thread(self.add, detection.crop_type, detection.id, vector)
+        return True
+
+    def remove(self, crop_type: str, detection_id: int):
+        self.get(crop_type).remove(detection_id)
+
+    async def rebuild(self, disease_classifiers, db) -> Dict[str, int]:
+        """
+        Recompute every index from detection_history. The new index is built
+        in a scratch directory and swapped in at the end, so a failed rebuild
+        leaves the current one in place.
+        """
+        from models.database_models import DetectionHistory
+        from sqlalchemy import or_
+
+        build_dir = self.index_dir.with_name(self.index_dir.name + ".rebuild")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        build_dir.mkdir(parents=True)
+        staging = SimilarityIndex(str(build_dir))
+
+        counts: Dict[str, int] = {}
+        query = db.query(DetectionHistory).filter(
+            or_(DetectionHistory.image_data.isnot(None), DetectionHistory.image_path.isnot(None))
+        )
+        for detection in query.order_by(DetectionHistory.id).yield_per(100):
+            try:
+                if await staging.index_detection(disease_classifiers, detection):
+                    counts[detection.crop_type] = counts.get(detection.crop_type, 0) + 1
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Skipping detection {detection.id}: {e}")
+
+        # Servers notice the replaced files and remap them on their next search
+        old_dir = self.index_dir.with_name(self.index_dir.name + ".old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if self.index_dir.exists():
+            self.index_dir.rename(old_dir)
+        build_dir.rename(self.index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self.indexes = {}
+        return counts
@@ -0,0 +1,117 @@
+"""Tiled analysis of high-resolution field images"""
+import numpy as np
+from PIL import Image
+from typing import Dict
+
+from models.base_classifier import BaseDiseaseClassifier
+from utils.config import settings
+from utils.image_processor import plan_tiles, extract_tiles
+
+SEVERITY_ORDER = ["none", "low", "medium", "high"]
+
+
+class TiledAnalysisService:
+    """Runs a disease classifier over overlapping tiles of a large image"""
+
+    def __init__(self):
+        self.tile_size = settings.TILE_SIZE
+        self.stride = max(1, int(self.tile_size * (1 - settings.TILE_OVERLAP)))
+        self.max_tiles = settings.MAX_TILES_PER_REQUEST
+        self.batch_size = settings.TILE_BATCH_SIZE
+
+    def prepare(self, image: Image.Image) -> Image.Image:
+        """Decode and resize the image so the tile grid covers it exactly"""
+        size, _, _ = plan_tiles(image.size, self.tile_size, self.stride, self.max_tiles)
+
+        # Let JPEG decode at reduced scale when the grid needs a smaller image
+        image.draft("RGB", size)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        return image
+
+    async def analyze(self, image: Image.Image, classifier: BaseDiseaseClassifier) -> Dict:
+        """Per-tile disease grid plus aggregated severity for a prepared image"""
+        if classifier.model is None:
+            await classifier.load_model()
+        return self.analyze_sync(image, classifier)
+
+    def analyze_sync(self, image: Image.Image, classifier: BaseDiseaseClassifier) -> Dict:
+        """Blocking analyze for worker threads; the classifier must already be loaded"""
+        tiles = extract_tiles(np.asarray(image), self.tile_size, self.stride)
+        rows, cols = tiles.shape[:2]
+
+        # Only one batch of tiles is materialised as float32 at a time
+        rows_per_batch = max(1, self.batch_size // cols)
+        probabilities = []
+        for start in range(0, rows, rows_per_batch):
+            batch = tiles[start:start + rows_per_batch].reshape(-1, self.tile_size, self.tile_size, 3)
+            batch = batch.astype(np.float32)
+            batch /= 255.0
+            probabilities.append(classifier.predict_batch_sync(batch, batch_size=self.batch_size))
+        probabilities = np.concatenate(probabilities)
+
+        class_idx = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(class_idx)), class_idx]
+
+        grid = [
+            [
+                {
+                    "disease": classifier.class_names[class_idx[r * cols + c]],
+                    "confidence": float(confidences[r * cols + c])
+                }
+                for c in range(cols)
+            ]
+            for r in range(rows)
+        ]
+
+        return {
+            "rows": rows,
+            "cols": cols,
+            "tile_size": self.tile_size,
+            "stride": self.stride,
+            "grid": grid,
+            **self._aggregate(class_idx, classifier)
+        }
+
+    def _aggregate(self, class_idx: np.ndarray, classifier: BaseDiseaseClassifier) -> Dict:
+        """Disease coverage and overall severity across tiles"""
+        counts = np.bincount(class_idx, minlength=len(classifier.class_names))
+        fractions = counts / len(class_idx)
+        disease_fractions = {
+            classifier.class_names[i]: float(fractions[i])
+            for i in np.flatnonzero(counts)
+        }
+
+        affected = {
+            disease: fraction
+            for disease, fraction in disease_fractions.items()
+            if classifier.severity_map.get(disease, "medium") != "none"
+        }
+        affected_fraction = float(sum(affected.values()))
+
+        if not affected:
+            return {
+                "disease_fractions": disease_fractions,
+                "affected_fraction": 0.0,
+                "dominant_disease": "healthy",
+                "severity": "none"
+            }
+
+        dominant_disease = max(affected, key=affected.get)
+
+        # Worst disease that covers a meaningful share of the image
+        significant = [
+            classifier.severity_map.get(disease, "medium")
+            for disease, fraction in affected.items()
+            if fraction >= settings.TILE_MIN_DISEASE_FRACTION
+        ]
+        severity = max(significant, key=SEVERITY_ORDER.index) if significant else "low"
+
+        return {
+            "disease_fractions": disease_fractions,
+            "affected_fraction": affected_fraction,
+            "dominant_disease": dominant_disease,
+            "severity": severity
+        }
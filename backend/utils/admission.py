@@ -0,0 +1,204 @@
+"""Admission control for the inference routes"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from utils.config import settings
+
+
+class TokenBucket:
+    """Token bucket rate limiter for a single client"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self) -> float:
+        """Take one token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets keyed by client address, capped at max_clients"""
+
+    def __init__(self, per_minute: int, burst: int, max_clients: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, client_id: str) -> float:
+        """Returns 0 if the request is allowed, otherwise seconds to wait"""
+        bucket = self.buckets.get(client_id)
+        if bucket is None:
+            # Evict the least recently seen client so the map never grows past the cap
+            while len(self.buckets) >= self.max_clients:
+                self.buckets.popitem(last=False)
+            bucket = self.buckets[client_id] = TokenBucket(self.rate, self.burst)
+        else:
+            self.buckets.move_to_end(client_id)
+        return bucket.consume()
+
+
+class AdmissionController:
+    """Bounded inference queue with per-request deadlines"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def is_full(self) -> bool:
+        """True when every slot is busy and the wait queue is at capacity"""
+        return self.active >= self.max_concurrency and self.waiting >= self.max_queue
+
+    def stats(self) -> Dict:
+        """Current queue occupancy"""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
+
+    def reject(self) -> HTTPException:
+        """503 telling the client when to come back"""
+        return HTTPException(
+            status_code=503,
+            detail="Inference queue is full, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    @asynccontextmanager
+    async def acquire(self, deadline: Optional[float] = None):
+        """
+        Wait for an inference slot until the monotonic deadline. The deadline
+        only bounds queueing: a free slot is always taken, however late.
+        """
+        if self.is_full():
+            raise self.reject()
+
+        self.waiting += 1
+        try:
+            if not self._semaphore.locked():
+                await self._semaphore.acquire()
+            else:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Request deadline exceeded while queued")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, request: Request):
+        """
+        Wait for an inference slot, dropping the request if its deadline passes.
+        Without a client-supplied deadline, the default wait starts here, after
+        the upload has been read, so slow uploads are not counted against it.
+        """
+        deadline = getattr(request.state, "deadline", None)
+        if deadline is None:
+            deadline = time.monotonic() + settings.REQUEST_DEADLINE_SECONDS
+        async with self.acquire(deadline):
+            # The client may have given up while we were queued
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client disconnected")
+            yield
+
+
+def get_admission_controller() -> AdmissionController:
+    """Build the admission controller from settings"""
+    return AdmissionController(
+        max_concurrency=settings.INFERENCE_CONCURRENCY,
+        max_queue=settings.INFERENCE_QUEUE_DEPTH,
+        retry_after=settings.RETRY_AFTER_SECONDS
+    )
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Build the per-client rate limiter, or None when disabled"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    return RateLimiter(
+        per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        burst=settings.RATE_LIMIT_BURST,
+        max_clients=settings.RATE_LIMIT_MAX_CLIENTS
+    )
+
+
+def _client_id(request: Request) -> str:
+    """
+    Identify the caller by its socket address. X-Forwarded-For is only
+    honoured when that address is a trusted proxy, and then the nearest
+    untrusted hop is used, since anything further left is client-supplied.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if peer not in settings.TRUSTED_PROXIES:
+        return peer
+
+    forwarded = request.headers.get("x-forwarded-for", "")
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in settings.TRUSTED_PROXIES:
+            return hop
+    return peer
+
+
+async def admission_middleware(request: Request, call_next):
+    """Reject excess detection traffic before the upload body is read"""
+    # CORS preflights carry no work and must not use up rate-limit tokens
+    if request.method == "OPTIONS" or not request.url.path.startswith(settings.ADMISSION_PATH_PREFIX):
+        return await call_next(request)
+
+    rate_limiter = getattr(request.app.state, "rate_limiter", None)
+    if rate_limiter is not None:
+        wait = rate_limiter.check(_client_id(request))
+        if wait > 0:
+            return JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    admission = getattr(request.app.state, "admission", None)
+    if admission is not None and admission.is_full():
+        error = admission.reject()
+        return JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+
+    # Clients may announce how long they are prepared to wait, counted from now
+    client_timeout = request.headers.get("x-request-timeout")
+    if client_timeout is not None:
+        try:
+            timeout = min(settings.REQUEST_DEADLINE_SECONDS, float(client_timeout))
+            request.state.deadline = time.monotonic() + timeout
+        except ValueError:
+            pass
+
+    return await call_next(request)
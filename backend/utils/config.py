@@ -21,11 +21,74 @@ class Settings(BaseSettings):
     CASSAVA_CLASSIFIER_PATH: str = "models/cassava_disease_classifier.h5"
     TOMATO_CLASSIFIER_PATH: str = "models/tomato_disease_classifier.h5"
     
+    # Versioned model store: <MODEL_STORE_DIR>/<model>/<version>/model.h5
+    MODEL_STORE_DIR: str = "models/versions"
+    MODEL_WATCH_INTERVAL: float = 0.0
+    
+    # Admin API (disabled while empty)
+    ADMIN_TOKEN: str = ""
+    
+    # On-demand profiling
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_TF_TRACE: bool = True
+    PROFILE_MAX_STORED: int = 50
+    PROFILE_PATH_PREFIXES: List[str] = ["/api/detect", "/api/history"]
+    
     # Data paths
     DATA_DIR: str = "data"
     DISEASE_DB_PATH: str = "data/disease_database.json"
     TREATMENTS_DB_PATH: str = "data/treatments.json"
     
+    # Upload limits
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 40_000_000
+    
+    # Tiled analysis
+    TILE_SIZE: int = 224
+    TILE_OVERLAP: float = 0.25
+    MAX_TILES_PER_REQUEST: int = 64
+    TILE_BATCH_SIZE: int = 32
+    TILE_MIN_DISEASE_FRACTION: float = 0.1
+    
+    # Head retraining
+    FEATURE_CACHE_DIR: str = "data/feature_cache"
+    
+    # Similar-case search
+    SIMILARITY_INDEX_DIR: str = "data/similarity_index"
+    SIMILARITY_CHUNK_ROWS: int = 65536
+    SIMILARITY_ANN_MIN_ROWS: int = 50000
+    SIMILARITY_MAX_K: int = 50
+    
+    # Asynchronous jobs
+    JOBS_DIR: str = "data/jobs"
+    JOB_WORKERS: int = 2
+    JOB_MAX_IMAGES: int = 100
+    JOB_MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    JOB_POLL_SECONDS: float = 2.0
+    JOB_RETENTION_HOURS: float = 24.0
+    JOB_CLEANUP_INTERVAL_SECONDS: float = 600.0
+    
+    # Admission control
+    ADMISSION_PATH_PREFIX: str = "/api/detect"
+    INFERENCE_CONCURRENCY: int = 2
+    INFERENCE_QUEUE_DEPTH: int = 16
+    RETRY_AFTER_SECONDS: int = 5
+    REQUEST_DEADLINE_SECONDS: float = 30.0
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_MINUTE: int = 30
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+    # Proxy addresses whose X-Forwarded-For header is trusted for rate limiting
+    TRUSTED_PROXIES: List[str] = []
+    
+    # Live camera detection
+    LIVE_MAX_FPS: float = 4.0
+    LIVE_LOADED_FPS: float = 1.0
+    LIVE_FRAME_MAX_BYTES: int = 512 * 1024
+    LIVE_DEDUP_THRESHOLD: int = 4
+    LIVE_FRAME_DEADLINE_SECONDS: float = 2.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -17,7 +17,7 @@ Base = declarative_base()
 async def init_db():
     """Initialize database tables"""
     # Import models here to avoid circular imports
-    from models.database_models import DetectionHistory
+    from models.database_models import DetectionHistory, DetectionJob
     
     # Create tables
     Base.metadata.create_all(bind=engine)
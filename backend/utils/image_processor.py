@@ -1,4 +1,8 @@
 """Image processing utilities"""
+import base64
+import binascii
+import io
+import math
 import numpy as np
 from PIL import Image
 from typing import Tuple
@@ -22,10 +26,74 @@ def process_image(
     image = image.resize(target_size, Image.Resampling.LANCZOS)
     
     # Convert to numpy array
-    image_array = np.array(image, dtype=np.float32)
+    image_array = np.asarray(image, dtype=np.float32)
     
-    # Normalize to [0, 1]
-    image_array = image_array / 255.0
+    # Normalize to [0, 1] in place
+    image_array /= 255.0
     
     return image_array
 
+
+
+def decode_base64_image(image_data: str) -> Image.Image:
+    """Open a base64 image, accepting a data URL prefix"""
+    if image_data.startswith("data:"):
+        image_data = image_data.split(",", 1)[1]
+    try:
+        image = Image.open(io.BytesIO(base64.b64decode(image_data)))
+        # Decode now so a truncated body fails here rather than in process_image
+        image.load()
+        return image
+    except (binascii.Error, OSError) as e:
+        raise ValueError(f"Invalid image data: {e}")
+
+
+def frame_fingerprint(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image as an integer.
+    Near-identical frames differ in only a few bits.
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def fingerprint_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count("1")
+
+
+def plan_tiles(
+    size: Tuple[int, int],
+    tile_size: int,
+    stride: int,
+    max_tiles: int
+) -> Tuple[Tuple[int, int], int, int]:
+    """
+    Choose a tile grid for an image of the given size.
+    The image is scaled down until the grid fits in max_tiles, and the
+    returned size is snapped so the tiles cover it exactly.
+    Returns ((width, height), rows, cols).
+    """
+    width, height = size
+    scale = 1.0
+    while True:
+        cols = max(1, round((width * scale - tile_size) / stride) + 1)
+        rows = max(1, round((height * scale - tile_size) / stride) + 1)
+        if rows * cols <= max_tiles:
+            break
+        scale *= min(0.95, math.sqrt(max_tiles / (rows * cols)))
+    
+    return (tile_size + (cols - 1) * stride, tile_size + (rows - 1) * stride), rows, cols
+
+
+def extract_tiles(image_array: np.ndarray, tile_size: int, stride: int) -> np.ndarray:
+    """
+    Overlapping tiles of an HxWxC array as a (rows, cols, tile, tile, C) view.
+    No pixel data is copied.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(
+        image_array, (tile_size, tile_size), axis=(0, 1)
+    )[::stride, ::stride]
+    return windows.transpose(0, 1, 3, 4, 2)
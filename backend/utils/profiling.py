@@ -0,0 +1,236 @@
+"""On-demand request profiling"""
+import json
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils.config import settings
+from utils.security import is_valid_admin_token
+
+FALSE_HEADER_VALUES = {b"", b"0", b"false", b"no", b"off"}
+
+SAMPLING_NOTE = (
+    "Stacks are sampled from the event-loop thread, so work from requests running "
+    "concurrently (and idle waits in the loop) is mixed into these samples."
+)
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, duration: float, limit: int = 25) -> List[Dict]:
+        """
+        Functions ranked by self time (samples where they were the innermost frame).
+        Times are scaled from sample shares of the measured wall duration, since
+        the sampler can fall behind its interval while the GIL is busy.
+        """
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for function in set(stack):
+                total_counts[function] += count
+
+        return [
+            {
+                "function": function,
+                "self_ms": round(duration * 1000 * count / self.samples, 1),
+                "self_percent": round(100.0 * count / self.samples, 1),
+                "total_ms": round(duration * 1000 * total_counts[function] / self.samples, 1)
+            }
+            for function, count in self_counts.most_common(limit)
+        ]
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format, ready for flamegraph tools"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profiles the next N matching requests, or any request that asks for it"""
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        self.profile_dir = Path(profile_dir or settings.PROFILE_DIR)
+        self.remaining = 0
+        self._tf_lock = threading.Lock()
+
+    def arm(self, requests: int):
+        self.remaining = max(0, requests)
+
+    def status(self) -> Dict:
+        return {"remaining": self.remaining, "profiles": len(self.list_profiles())}
+
+    def list_profiles(self) -> List[Dict]:
+        """Summaries of stored profiles, newest first"""
+        if not self.profile_dir.exists():
+            return []
+        summaries = []
+        for summary_file in self.profile_dir.glob("*/summary.json"):
+            with open(summary_file, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+            summary.pop("top_functions", None)
+            summaries.append(summary)
+        return sorted(summaries, key=lambda s: s["started_at"], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        summary_file = self.path(profile_id) / "summary.json"
+        if not summary_file.exists():
+            return None
+        with open(summary_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def path(self, profile_id: str) -> Path:
+        # Profile ids are generated hex strings; anything else can't name a directory of ours
+        if not profile_id.isalnum():
+            return self.profile_dir / "_invalid_"
+        return self.profile_dir / profile_id
+
+    def archive(self, profile_id: str) -> Optional[Path]:
+        """Zip a profile's artefacts for download"""
+        profile_path = self.path(profile_id)
+        if not profile_path.is_dir():
+            return None
+        archive = shutil.make_archive(str(profile_path), "zip", root_dir=str(profile_path))
+        return Path(archive)
+
+    def start_tf_trace(self, logdir: Path) -> bool:
+        """Start a TensorFlow trace unless another request holds the (process-wide) profiler"""
+        if not settings.PROFILE_TF_TRACE or not self._tf_lock.acquire(blocking=False):
+            return False
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.start(str(logdir))
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not start TensorFlow trace: {e}")
+            self._tf_lock.release()
+            return False
+
+    def stop_tf_trace(self):
+        try:
+            import tensorflow as tf
+            tf.profiler.experimental.stop()
+        finally:
+            self._tf_lock.release()
+
+    def save(self, profile_id: str, sampler: StackSampler, summary: Dict):
+        profile_path = self.path(profile_id)
+        profile_path.mkdir(parents=True, exist_ok=True)
+        (profile_path / "stacks.txt").write_text(sampler.collapsed(), encoding="utf-8")
+        with open(profile_path / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        self._prune()
+
+    def _prune(self):
+        """Keep only the newest PROFILE_MAX_STORED profiles"""
+        profiles = sorted(
+            (p for p in self.profile_dir.iterdir() if p.is_dir()),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for old in profiles[settings.PROFILE_MAX_STORED:]:
+            shutil.rmtree(old, ignore_errors=True)
+            old.with_suffix(".zip").unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests under PROFILE_PATH_PREFIXES when
+    armed through the admin API or when an admin sends X-Profile. Otherwise it
+    only compares a counter and a header before passing the request straight
+    through. CORS preflights are never profiled.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, path_prefixes: Optional[List[str]] = None):
+        self.app = app
+        self.profiler = profiler
+        self.path_prefixes = tuple(path_prefixes if path_prefixes is not None else settings.PROFILE_PATH_PREFIXES)
+
+    def _requested(self, scope) -> bool:
+        headers = scope.get("headers") or []
+        flag = next((value for name, value in headers if name == b"x-profile"), b"")
+        if flag.strip().lower() in FALSE_HEADER_VALUES:
+            return False
+        token = next((value for name, value in headers if name == b"x-admin-token"), b"")
+        return is_valid_admin_token(token.decode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or \
+                not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+        if self.profiler.remaining <= 0 and not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self.profiler.remaining > 0:
+            self.profiler.remaining -= 1
+
+        profile_id = uuid.uuid4().hex
+        status = {"code": None}
+
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000.0)
+        tf_trace = self.profiler.start_tf_trace(self.profiler.path(profile_id) / "tf_trace")
+        started_at = datetime.utcnow().isoformat()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - started
+            if tf_trace:
+                self.profiler.stop_tf_trace()
+
+            self.profiler.save(profile_id, sampler, {
+                "id": profile_id,
+                "path": scope["path"],
+                "status_code": status["code"],
+                "started_at": started_at,
+                "duration_ms": round(duration * 1000, 1),
+                "samples": sampler.samples,
+                "sample_interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+                "tf_trace": tf_trace,
+                "note": SAMPLING_NOTE,
+                "top_functions": sampler.top_functions(duration)
+            })
@@ -0,0 +1,12 @@
+"""Security helpers"""
+import secrets
+from typing import Optional
+from utils.config import settings
+
+
+def is_valid_admin_token(token: Optional[str]) -> bool:
+    """True if the token matches the configured admin token (never when unset)"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    # compare_digest rejects non-ASCII str, so compare the encoded bytes
+    return secrets.compare_digest(token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8"))
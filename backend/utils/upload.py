@@ -0,0 +1,159 @@
+"""Size-bounded upload handling"""
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from utils.config import settings
+
+UPLOAD_TOO_LARGE = "Upload exceeds the maximum allowed size"
+INVALID_IMAGE = "Uploaded file is not a valid image"
+
+
+class UploadTooLarge(HTTPException):
+    """Raised when an upload exceeds the size limit"""
+    
+    def __init__(self):
+        super().__init__(status_code=413, detail=UPLOAD_TOO_LARGE)
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware that stops reading request bodies past a size limit
+
+    Requests announcing a larger Content-Length are rejected up front; chunked
+    bodies are counted as they stream in so they never reach the spooled
+    multipart buffer in full.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str = "/api", overrides: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+        self.overrides = overrides or {}
+
+    def _limit(self, path: str) -> int:
+        """Limit for a path; the longest matching override prefix wins"""
+        matches = [prefix for prefix in self.overrides if path.startswith(prefix)]
+        return self.overrides[max(matches, key=len)] if matches else self.max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self._limit(scope["path"])
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            # The 413 is sent from here rather than raised, because exceptions
+            # raised inside receive() get rewrapped by the layers in between
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if rejected:
+                # The app's own reaction to the disconnect is not sent
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": UPLOAD_TOO_LARGE}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _upload_size(file: UploadFile) -> int:
+    """Size of the spooled upload without reading it into memory"""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def check_image_pixels(image: Image.Image):
+    """Reject an opened image whose header declares more than MAX_IMAGE_PIXELS"""
+    width, height = image.size
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image has {width}x{height} pixels, limit is {settings.MAX_IMAGE_PIXELS}"
+        )
+
+
+def open_upload_image(
+    file: UploadFile,
+    draft_size: Optional[Tuple[int, int]] = None
+) -> Image.Image:
+    """
+    Open an uploaded image straight from its spooled buffer.
+    Only the header is parsed here, so oversized files and images declaring
+    too many pixels are rejected before any pixel data is decoded.
+    """
+    if _upload_size(file) > settings.MAX_UPLOAD_BYTES:
+        raise UploadTooLarge()
+
+    file.file.seek(0)
+    try:
+        image = Image.open(file.file)
+    except Exception:
+        raise HTTPException(status_code=400, detail=INVALID_IMAGE)
+
+    check_image_pixels(image)
+
+    # Let JPEG decode at a reduced scale when only a small input is needed
+    if draft_size is not None:
+        image.draft("RGB", draft_size)
+
+    return image
+
+
+@contextmanager
+def decoding_upload():
+    """
+    Wrap the first pixel access of an image from open_upload_image.
+    A corrupt or truncated body only fails once it is decoded, and that is
+    the client's fault rather than a server error.
+    """
+    try:
+        yield
+    except OSError:
+        raise HTTPException(status_code=400, detail=INVALID_IMAGE)